@@ -0,0 +1,604 @@
+# FastAPI backend: SQLite user persistence, document ingestion into Pinecone and chat.
+# Imported by the Streamlit UI (ask_your_pa.py), which calls the core actions in-process.
+
+from dotenv import load_dotenv
+load_dotenv()
+import asyncio
+import io
+import codecs
+import uuid
+import os
+import orjson
+import hmac
+import atexit
+import sqlite3
+import functools
+from array import array
+import sys
+import logging
+import time
+from contextlib import asynccontextmanager, aclosing
+from fastapi import FastAPI, UploadFile, File, Form, BackgroundTasks, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from threading import Thread, Lock
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import tempfile
+import uvicorn
+from pinecone import ServerlessSpec
+from pinecone.grpc import PineconeGRPC as Pinecone
+from PyPDF2 import PdfReader
+import pypdfium2 as pdfium
+import docx
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+import openai
+from argon2 import PasswordHasher, extract_parameters
+from argon2.exceptions import InvalidHashError, VerificationError
+from email_validator import validate_email, EmailNotValidError
+
+# --------------------------- CONFIGURATION ---------------------------
+# Configuration constants including chunking parameters for text processing,
+# OpenAI API settings, and user data file location.
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+embedding_model = "text-embedding-3-small"
+llm_model = "gpt-3.5-turbo"
+USER_DB_FILE = "users.db"
+USER_FILE = "users.json"
+EMBEDDING_BATCH_SIZE = 2048
+EMBEDDING_MAX_TOKENS = 250_000
+EMBEDDING_CHARS_PER_TOKEN = 2
+EMBEDDING_CONCURRENCY = 5
+UPSERT_BATCH_SIZE = 100
+UPSERT_CONCURRENCY = 30
+PDF_PARALLEL_MIN_PAGES = 32
+PDF_PAGES_PER_TASK = 8
+TEXT_BLOCK_BYTES = 64 * 1024
+INGEST_SEGMENT_CHARS = 256 * 1024
+INGEST_ROUND_CHUNKS = 1024
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+
+# --------------------------- FASTAPI SETUP ---------------------------
+# Initializes FastAPI app with CORS middleware and configures Pinecone vector DB index.
+_server_loop = None
+
+@asynccontextmanager
+async def lifespan(app):
+    # The Streamlit UI runs coroutines on this loop (see run_on_server).
+    global _server_loop
+    init_user_db()
+    init_clients()
+    _server_loop = asyncio.get_running_loop()
+    yield
+    _server_loop = None
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# text-embedding-3-small is truncated to 512 dimensions; the index name carries the
+# dimension so existing 1536-dim indexes are left untouched.
+embedding_dim = 512
+index_name = f"user-profile-index-{embedding_dim}"
+
+# Pinecone and OpenAI clients are created once, on server startup.
+pc = None
+index = None
+_openai = None
+_openai_async = None
+
+def init_clients():
+    global pc, index, _openai, _openai_async
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY"))
+    if index_name not in pc.list_indexes().names():
+        pc.create_index(
+            name=index_name,
+            dimension=embedding_dim,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+    index = pc.Index(index_name)
+
+    _openai = openai.OpenAI(api_key=OPENAI_API_KEY)
+    _openai_async = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+
+# --------------------------- PERSISTENCE HELPERS ---------------------------
+# SQLite-backed user store (WAL mode), one row per user with a unique index on email.
+# Users from a legacy users.json file are imported once on first start.
+# The connection is opened once, from the FastAPI lifespan, and shared by all threads.
+_db = None
+_db_lock = Lock()
+
+def init_user_db():
+    global _db
+    with _db_lock:
+        if _db is not None:
+            return
+        _db = sqlite3.connect(USER_DB_FILE, check_same_thread=False)
+        atexit.register(_db.close)
+        _db.execute("PRAGMA journal_mode=WAL")
+        _db.execute("PRAGMA synchronous=NORMAL")
+        _db.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "uid TEXT PRIMARY KEY, first TEXT, last TEXT, email TEXT UNIQUE COLLATE NOCASE, password TEXT)"
+        )
+    import_users_from_file()
+
+def import_users_from_file():
+    if not os.path.exists(USER_FILE):
+        return
+    with open(USER_FILE, "rb") as f:
+        users = orjson.loads(f.read())
+    rows = [(uid, u["first_name"], u["last_name"], u["email"].strip().lower(), u["password"]) for uid, u in users.items()]
+    with _db_lock, _db:
+        _db.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?, ?)", rows)
+    os.replace(USER_FILE, USER_FILE + ".imported")
+
+def add_user(user_id, first_name, last_name, email, password):
+    with _db_lock, _db:
+        _db.execute(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+            (user_id, first_name, last_name, email, password)
+        )
+
+def get_user_id(email):
+    with _db_lock:
+        row = _db.execute("SELECT uid FROM users WHERE email = ?", (email.strip().lower(),)).fetchone()
+    return row[0] if row else None
+
+@functools.lru_cache(maxsize=1024)
+def get_user(user_id):
+    with _db_lock:
+        row = _db.execute(
+            "SELECT first, last, email, password FROM users WHERE uid = ?", (user_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    first_name, last_name, email, password = row
+    return {"first_name": first_name, "last_name": last_name, "email": email, "password": password}
+
+def set_password_hash(user_id, password_hash):
+    with _db_lock, _db:
+        _db.execute("UPDATE users SET password = ? WHERE uid = ?", (password_hash, user_id))
+    get_user.cache_clear()
+
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
+def _is_argon2_hash(stored):
+    # Anything that isn't a well-formed argon2 hash is a plaintext password stored before
+    # hashing was introduced, including plaintext that happens to start with "$argon2".
+    if not (stored.startswith("$argon2") and stored.isascii()):
+        return False
+    try:
+        extract_parameters(stored)
+    except (InvalidHashError, ValueError):
+        return False
+    return True
+
+def verify_password(user_id, password):
+    stored = get_user(user_id)["password"]
+    if _is_argon2_hash(stored):
+        try:
+            _password_hasher.verify(stored, password)
+        except VerificationError:
+            return False
+        needs_rehash = _password_hasher.check_needs_rehash(stored)
+    else:
+        # Legacy plaintext password; upgrade it to a hash on a successful login.
+        if not hmac.compare_digest(stored.encode(), password.encode()):
+            return False
+        needs_rehash = True
+    if needs_rehash:
+        set_password_hash(user_id, _password_hasher.hash(password))
+    return True
+
+# --------------------------- CORE ACTIONS ---------------------------
+# Signup, login, append and chat logic shared by the FastAPI routes and the in-process
+# Streamlit UI. `schedule(func, *args)` queues background ingestion work.
+def signup(first_name, last_name, email, password, about, filename, data, schedule):
+    # Emails are stored normalized so lookups never have to normalize stored values.
+    email = email.strip().lower()
+    try:
+        validate_email(email, check_deliverability=False)
+    except EmailNotValidError:
+        return {"message": "Invalid email address"}, 400
+
+    user_id = str(uuid.uuid4())
+    try:
+        add_user(user_id, first_name, last_name, email, _password_hasher.hash(password))
+    except sqlite3.IntegrityError:
+        return {"message": "Email already registered"}, 409
+
+    start_ingest(schedule, user_id, email, about, filename, data, user_id)
+    return {"message": "User registered successfully", "status": "processing", "user_id": user_id}
+
+def login(email, password):
+    uid = get_user_id(email)
+    if uid is not None and verify_password(uid, password):
+        return {"message": "Login successful", "user_id": uid}
+    return {"message": "Invalid credentials"}
+
+def append(email, about, filename, data, schedule):
+    user_id = get_user_id(email)
+    if user_id is None:
+        return {"message": "User not found"}, 404
+
+    # Tag vectors with the stored, normalized email rather than whatever the caller typed.
+    id_prefix = f"{user_id}-extra-{uuid.uuid4().hex[:6]}"
+    start_ingest(schedule, user_id, get_user(user_id)["email"], about, filename, data, id_prefix)
+    return {"message": "Data submitted for processing", "status": "processing"}
+
+def get_ingest_status(user_id):
+    with _ingest_lock:
+        status = ingest_status.get(user_id)
+        if status is None:
+            state = "ready"
+        elif status["running"]:
+            state = "processing"
+        else:
+            state = "failed" if status["failed"] else "ready"
+    return {"user_id": user_id, "status": state}
+
+async def chat(email, query):
+    user_id = get_user_id(email)
+    if user_id is None:
+        return {"response": "User not found"}, 404
+
+    query_embedding = (await asyncio.to_thread(_embed_one, query.strip(), embedding_model)).tolist()
+    # The gRPC query blocks for a full round-trip, so it runs off the event loop.
+    results = await asyncio.to_thread(
+        index.query,
+        vector=query_embedding,
+        top_k=5,
+        include_metadata=True,
+        filter={"user_id": {"$eq": user_id}}
+    )
+    relevant_chunks = [m["metadata"]["text"] for m in results["matches"]]
+
+    context = "\n".join(relevant_chunks)
+    response = await _openai_async.chat.completions.create(
+        model=llm_model,
+        messages=[
+            {"role": "system", "content": "You are an assistant answering user-specific questions based on their uploaded data."},
+            {"role": "user", "content": f"Context: {context}\n\nQuestion: {query}"}
+        ]
+    )
+    return {"response": response.choices[0].message.content.strip()}
+
+# --------------------------- API ROUTES ---------------------------
+# FastAPI endpoints to handle user signup, login, appending info, and chat-based query resolution.
+def _raise_for_error(result):
+    # Core actions report failures as a (body, status_code) tuple whose body holds one message.
+    if isinstance(result, tuple):
+        body, status_code = result
+        (message,) = body.values()
+        raise HTTPException(status_code=status_code, detail=message)
+    return result
+
+@app.post("/signup", status_code=202)
+async def signup_user(
+    background_tasks: BackgroundTasks,
+    first_name: str = Form(...),
+    last_name: str = Form(...),
+    email: str = Form(...),
+    password: str = Form(...),
+    about: str = Form(...),
+    document: UploadFile = File(...)
+):
+    data = await document.read()
+    # Hashing the password is deliberately slow, so signup runs off the event loop.
+    result = await asyncio.to_thread(
+        signup, first_name, last_name, email, password, about, document.filename, data, background_tasks.add_task
+    )
+    return _raise_for_error(result)
+
+# Declared sync so the password hash check runs in FastAPI's threadpool.
+@app.post("/login")
+def login_user(email: str = Form(...), password: str = Form(...)):
+    return login(email, password)
+
+@app.post("/append", status_code=202)
+async def append_user_data(
+    background_tasks: BackgroundTasks,
+    email: str = Form(...),
+    about: str = Form(...),
+    document: UploadFile = File(...)
+):
+    data = await document.read()
+    return _raise_for_error(append(email, about, document.filename, data, background_tasks.add_task))
+
+@app.get("/status/{user_id}")
+async def ingest_status_for_user(user_id: str):
+    return get_ingest_status(user_id)
+
+@app.post("/chat")
+async def chat_user_query(email: str = Form(...), query: str = Form(...)):
+    return _raise_for_error(await chat(email, query))
+
+# --------------------------- SERVER ---------------------------
+# uvicorn runs in a daemon thread. Streamlit re-executes the UI script on every
+# interaction, but this module is only imported once per process, so the server,
+# its event loop and all state below are shared by every rerun.
+_server = None
+_server_lock = Lock()
+_pending_futures = set()
+# Same logger uvicorn uses for exceptions raised by FastAPI background tasks.
+logger = logging.getLogger("uvicorn.error")
+
+def start_server():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return
+        # uvloop has no Windows build; fall back to the default asyncio loop there.
+        loop = "asyncio" if sys.platform == "win32" else "uvloop"
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=8000, loop=loop, http="httptools"))
+        thread = Thread(target=server.run, daemon=True)
+        thread.start()
+        # `started` is only set once the socket is bound, after the lifespan startup.
+        while not server.started:
+            if not thread.is_alive():
+                raise RuntimeError("FastAPI server failed to start on 127.0.0.1:8000")
+            time.sleep(0.05)
+        _server = server
+
+# Coroutines from the UI are run on the uvicorn event loop, since the shared
+# AsyncOpenAI client's connection pool is bound to the loop it was first used on.
+def run_on_server(coro):
+    return asyncio.run_coroutine_threadsafe(coro, _server_loop).result()
+
+def schedule_on_server(func, *args):
+    future = asyncio.run_coroutine_threadsafe(func(*args), _server_loop)
+    _pending_futures.add(future)
+    future.add_done_callback(_finish_scheduled)
+
+def _finish_scheduled(future):
+    # Nothing else retrieves the result of a scheduled job, so its exception is logged here.
+    _pending_futures.discard(future)
+    if not future.cancelled() and future.exception() is not None:
+        logger.error("Exception in background task", exc_info=future.exception())
+
+# --------------------------- INGESTION ---------------------------
+# Background embedding + upsert for uploaded documents. Signup and append return
+# as soon as the upload is read. ingest_status counts each user's running jobs, so
+# a user is only "ready" once every upload has finished; "failed" sticks until the
+# user's next upload starts.
+ingest_status: dict[str, dict] = {}
+_ingest_lock = Lock()
+
+def start_ingest(schedule, user_id, email, about, filename, data, id_prefix):
+    with _ingest_lock:
+        status = ingest_status.setdefault(user_id, {"running": 0, "failed": False})
+        if not status["running"]:
+            status["failed"] = False
+        status["running"] += 1
+    try:
+        schedule(embed_and_upsert, user_id, email, about, filename, data, id_prefix)
+    except BaseException:
+        _finish_ingest(user_id, failed=True)
+        raise
+
+def _finish_ingest(user_id, failed):
+    with _ingest_lock:
+        status = ingest_status[user_id]
+        status["running"] -= 1
+        status["failed"] = status["failed"] or failed
+
+async def embed_and_upsert(user_id, email, about, filename, data, id_prefix):
+    # Chunks are embedded and upserted in rounds of INGEST_ROUND_CHUNKS (~16 MiB of
+    # 512-dim embeddings as Python floats) while the document is still being extracted,
+    # so neither the full text nor all of its chunks or embeddings are held at once.
+    failed = True
+    try:
+        offset, pending = 0, []
+        async with aclosing(iter_document_chunks(filename, data, about)) as segments:
+            async for chunks in segments:
+                pending.extend(chunks)
+                while len(pending) >= INGEST_ROUND_CHUNKS:
+                    await embed_and_upsert_round(user_id, email, pending[:INGEST_ROUND_CHUNKS], id_prefix, offset)
+                    pending = pending[INGEST_ROUND_CHUNKS:]
+                    offset += INGEST_ROUND_CHUNKS
+        if pending:
+            await embed_and_upsert_round(user_id, email, pending, id_prefix, offset)
+        failed = False
+    finally:
+        _finish_ingest(user_id, failed)
+
+async def embed_and_upsert_round(user_id, email, chunks, id_prefix, offset):
+    embeddings = await get_openai_embeddings(chunks)
+    vectors = [
+        {
+            "id": f"{id_prefix}-{offset + i}",
+            "values": emb,
+            "metadata": {
+                "user_id": user_id,
+                "email": email,
+                "text": chunks[i]
+            }
+        } for i, emb in enumerate(embeddings)
+    ]
+    # The Pinecone client blocks until every upsert batch is acknowledged.
+    await asyncio.to_thread(upsert_vectors, vectors)
+
+# --------------------------- HELPERS ---------------------------
+# Utility functions for text extraction, chunking, and embedding generation.
+def extract_text(filename, data):
+    if filename.endswith(".txt"):
+        return data.decode("utf-8", errors="ignore")
+    elif filename.endswith(".pdf"):
+        return extract_pdf_text(data)
+    elif filename.endswith(".docx"):
+        doc = docx.Document(io.BytesIO(data))
+        return " ".join(p.text for p in doc.paragraphs)
+    return ""
+
+async def iter_document_text(filename, data):
+    # Yields the document's text in pieces: large PDFs a few pages at a time, text files
+    # in blocks. Other formats are small enough once parsed to extract in one go.
+    if filename.endswith(".pdf"):
+        n_pages = await asyncio.to_thread(count_pdf_pages, data)
+        if n_pages >= PDF_PARALLEL_MIN_PAGES:
+            async with aclosing(iter_pdf_text_parallel(data, n_pages)) as pages:
+                async for text in pages:
+                    yield text
+            return
+    elif filename.endswith(".txt"):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        for start in range(0, len(data), TEXT_BLOCK_BYTES):
+            yield decoder.decode(data[start:start + TEXT_BLOCK_BYTES])
+        yield decoder.decode(b"", final=True)
+        return
+    yield await asyncio.to_thread(extract_text, filename, data)
+
+async def iter_document_chunks(filename, data, about):
+    # Splits the text in segments of at most INGEST_SEGMENT_CHARS as it is extracted. Each
+    # segment ends just after the last occurrence of the coarsest separator it contains,
+    # which is where splitting the whole text would break it anyway; only the chunk
+    # overlap across a cut is lost.
+    text = about + "\n"
+    async with aclosing(iter_document_text(filename, data)) as pieces:
+        async for piece in pieces:
+            text += piece
+            while len(text) > INGEST_SEGMENT_CHARS:
+                end = _segment_end(text)
+                yield await asyncio.to_thread(chunk_text, text[:end])
+                text = text[end:]
+    yield await asyncio.to_thread(chunk_text, text)
+
+def _segment_end(text):
+    for separator in CHUNK_SEPARATORS[:-1]:
+        end = text.rfind(separator, 0, INGEST_SEGMENT_CHARS)
+        if end > 0:
+            return end + len(separator)
+    return INGEST_SEGMENT_CHARS
+
+# PDFium is not thread-safe. In this process every PDFium call holds _pdfium_lock, since
+# concurrent uploads extract from different default-executor threads. Large PDFs are
+# split into page ranges extracted in worker processes instead. One bounded pool is
+# shared by all uploads, and it uses "spawn" because forking this process (uvicorn,
+# Streamlit and gRPC threads) can hang.
+_pdfium_lock = Lock()
+_pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+def extract_pdf_text(data):
+    try:
+        with _pdfium_lock:
+            return "\n\n".join(_extract_pdf_pages(data))
+    except pdfium.PdfiumError:
+        # Fall back to the pure-Python reader for files PDFium rejects.
+        reader = PdfReader(io.BytesIO(data))
+        return "\n\n".join(page.extract_text() or "" for page in reader.pages)
+
+def count_pdf_pages(data):
+    with _pdfium_lock:
+        try:
+            pdf = pdfium.PdfDocument(data)
+        except pdfium.PdfiumError:
+            return 0
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+async def iter_pdf_text_parallel(data, n_pages):
+    # Workers open the PDF from a temp file rather than each receiving the bytes. Each
+    # window of pages is extracted across the pool and yielded before the next starts.
+    loop = asyncio.get_running_loop()
+    window = PDF_WORKERS * PDF_PAGES_PER_TASK
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            await asyncio.to_thread(f.write, data)
+        for window_start in range(0, n_pages, window):
+            window_stop = min(window_start + window, n_pages)
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(_pdf_pool, _extract_pdf_pages, path, start, min(start + PDF_PAGES_PER_TASK, window_stop))
+                for start in range(window_start, window_stop, PDF_PAGES_PER_TASK)
+            ))
+            yield "\n\n".join(text for part in parts for text in part) + "\n\n"
+    finally:
+        os.remove(path)
+
+def _extract_pdf_pages(source, start=0, stop=None):
+    # Pages and text pages are closed here rather than left to the garbage collector,
+    # which could finalize them on another thread after the caller releases the lock.
+    pdf = pdfium.PdfDocument(source)
+    try:
+        stop = len(pdf) if stop is None else stop
+        texts = []
+        for i in range(start, stop):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            texts.append(textpage.get_text_range())
+            textpage.close()
+            page.close()
+        return texts
+    finally:
+        pdf.close()
+
+CHUNK_SEPARATORS = ["\n\n", "\n", ". ", " ", ""]
+_splitter = RecursiveCharacterTextSplitter(
+    chunk_size=CHUNK_SIZE,
+    chunk_overlap=CHUNK_OVERLAP,
+    separators=CHUNK_SEPARATORS,
+    # Keep ". " at the end of the sentence it closes, not the start of the next chunk.
+    keep_separator="end"
+)
+
+def chunk_text(text):
+    return _splitter.split_text(text)
+
+def _embedding_batches(chunks):
+    # The embeddings endpoint caps a single request at 2048 inputs and 300k tokens. Tokens
+    # are estimated from characters at a conservative ratio (English averages ~4 per token),
+    # and batches are packed greedily in order.
+    max_chars = EMBEDDING_MAX_TOKENS * EMBEDDING_CHARS_PER_TOKEN
+    batch, batch_chars = [], 0
+    for chunk in chunks:
+        if batch and (len(batch) == EMBEDDING_BATCH_SIZE or batch_chars + len(chunk) > max_chars):
+            yield batch
+            batch, batch_chars = [], 0
+        batch.append(chunk)
+        batch_chars += len(chunk)
+    if batch:
+        yield batch
+
+async def get_openai_embeddings(chunks):
+    # Batches are sent concurrently, bounded to stay within rate limits.
+    sem = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+    async def embed_batch(batch):
+        async with sem:
+            return await _openai_async.embeddings.create(
+                input=batch, model=embedding_model, dimensions=embedding_dim
+            )
+
+    responses = await asyncio.gather(*(embed_batch(batch) for batch in _embedding_batches(chunks)))
+    return [r.embedding for response in responses for r in response.data]
+
+# Repeated chat questions reuse the cached query embedding. Entries are float32 arrays
+# (2 KiB at 512 dimensions, ~20 MiB with the cache full) instead of tuples of Python floats.
+@functools.lru_cache(maxsize=10000)
+def _embed_one(text, model):
+    response = _openai.embeddings.create(input=[text], model=model, dimensions=embedding_dim)
+    return array("f", response.data[0].embedding)
+
+def upsert_vectors(vectors):
+    # The gRPC client splits the upsert into batches and sends them in parallel; failed
+    # batches are reported in the response rather than raised.
+    response = index.upsert(
+        vectors=vectors,
+        batch_size=UPSERT_BATCH_SIZE,
+        max_concurrency=UPSERT_CONCURRENCY,
+        show_progress=False
+    )
+    if response.failed_item_count:
+        raise RuntimeError(
+            f"Pinecone rejected {response.failed_item_count} of {len(vectors)} vectors: {response.errors}"
+        )
@@ -0,0 +1,57 @@
+import orjson
+import pytest
+from argon2 import PasswordHasher
+
+import backend
+
+
+@pytest.fixture
+def user_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend, "_db", None)
+    monkeypatch.setattr(backend, "USER_DB_FILE", str(tmp_path / "users.db"))
+    monkeypatch.setattr(backend, "USER_FILE", str(tmp_path / "users.json"))
+    backend.get_user.cache_clear()
+    yield
+    backend._db.close()
+    backend.get_user.cache_clear()
+
+
+def import_legacy_user(email, password):
+    with open(backend.USER_FILE, "wb") as f:
+        f.write(orjson.dumps({"old-1": {"first_name": "Ana", "last_name": "Silva", "email": email, "password": password}}))
+    backend.init_user_db()
+
+
+def stored_password(user_id):
+    return backend.get_user(user_id)["password"]
+
+
+@pytest.mark.parametrize("password", ["secret", "pässwörd", "$argon2id$junk"])
+def test_legacy_plaintext_password_is_upgraded_on_login(user_db, password):
+    import_legacy_user("Old@X.com ", password)
+
+    assert backend.login("old@x.com", password)["user_id"] == "old-1"
+    assert stored_password("old-1").startswith("$argon2id$v=19$")
+    assert backend._password_hasher.verify(stored_password("old-1"), password)
+    assert backend.login("old@x.com", password)["user_id"] == "old-1"
+
+
+def test_wrong_password_is_rejected(user_db):
+    import_legacy_user("old@x.com", "pässwörd")
+    assert "user_id" not in backend.login("old@x.com", "passwort")
+    assert stored_password("old-1") == "pässwörd"
+
+    backend.login("old@x.com", "pässwörd")
+    upgraded = stored_password("old-1")
+    assert "user_id" not in backend.login("old@x.com", "passwort")
+    assert stored_password("old-1") == upgraded
+
+
+def test_hash_with_outdated_parameters_is_rehashed(user_db):
+    backend.init_user_db()
+    old_hash = PasswordHasher(time_cost=1, memory_cost=8, parallelism=1).hash("secret")
+    backend.add_user("u-1", "Ana", "Silva", "ana@x.com", old_hash)
+
+    assert backend.login("ana@x.com", "secret")["user_id"] == "u-1"
+    assert stored_password("u-1") != old_hash
+    assert not backend._password_hasher.check_needs_rehash(stored_password("u-1"))
@@ -0,0 +1,108 @@
+import asyncio
+
+import backend
+
+ABOUT = "Backend engineer based in Lisbon."
+DOCUMENT = "\n\n".join(
+    ". ".join(f"Paragraph {p} sentence {s} talks about projects and tools" for s in range(12))
+    for p in range(40)
+)
+
+
+def run_ingest(monkeypatch, jobs):
+    embedded_batches, upserted = [], []
+
+    async def fake_embeddings(chunks):
+        embedded_batches.append(len(chunks))
+        return [[float(len(chunk))] for chunk in chunks]
+
+    monkeypatch.setattr(backend, "get_openai_embeddings", fake_embeddings)
+    monkeypatch.setattr(backend, "upsert_vectors", upserted.extend)
+
+    async def main():
+        tasks = []
+        schedule = lambda func, *args: tasks.append(asyncio.ensure_future(func(*args)))
+        for job in jobs:
+            backend.start_ingest(schedule, *job)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    return embedded_batches, upserted
+
+
+def test_ingest_upserts_chunks_of_the_joined_text(monkeypatch):
+    monkeypatch.setattr(backend, "INGEST_ROUND_CHUNKS", 8)
+    job = ("user-1", "a@example.com", ABOUT, "cv.txt", DOCUMENT.encode(), "user-1")
+
+    embedded_batches, upserted = run_ingest(monkeypatch, [job])
+
+    expected = backend.chunk_text(ABOUT + "\n" + DOCUMENT)
+    assert len(expected) > 8
+    assert [v["metadata"]["text"] for v in upserted] == expected
+    assert [v["id"] for v in upserted] == [f"user-1-{i}" for i in range(len(expected))]
+    assert max(embedded_batches) == 8
+    assert backend.get_ingest_status("user-1")["status"] == "ready"
+
+
+def test_ingest_streams_long_documents_in_segments(monkeypatch):
+    monkeypatch.setattr(backend, "INGEST_SEGMENT_CHARS", 3000)
+    monkeypatch.setattr(backend, "TEXT_BLOCK_BYTES", 1000)
+    job = ("user-3", "c@example.com", ABOUT, "cv.txt", DOCUMENT.encode(), "user-3")
+    segments = []
+    chunk_text = backend.chunk_text
+    monkeypatch.setattr(backend, "chunk_text", lambda text: segments.append(text) or chunk_text(text))
+
+    _, upserted = run_ingest(monkeypatch, [job])
+
+    # Every cut falls on a paragraph break, so each segment is a run of whole paragraphs.
+    assert len(segments) > 1
+    assert "".join(segments) == ABOUT + "\n" + DOCUMENT
+    assert all(len(segment) <= 3000 and segment.endswith("\n\n") for segment in segments[:-1])
+    texts = [v["metadata"]["text"] for v in upserted]
+    assert texts == [chunk for segment in segments for chunk in chunk_text(segment)]
+    assert all(len(text) <= backend.CHUNK_SIZE for text in texts)
+    assert [v["id"] for v in upserted] == [f"user-3-{i}" for i in range(len(texts))]
+
+
+def test_ingest_status_waits_for_every_job(monkeypatch):
+    first = ("user-2", "b@example.com", ABOUT, "cv.txt", DOCUMENT.encode(), "user-2")
+    second = ("user-2", "b@example.com", "Second upload.", "cv.txt", DOCUMENT.encode(), "user-2-extra")
+    second_released = None
+
+    async def fake_embeddings(chunks):
+        if chunks[0].startswith("Second upload."):
+            await second_released.wait()
+        return [[0.0] for _ in chunks]
+
+    monkeypatch.setattr(backend, "get_openai_embeddings", fake_embeddings)
+    monkeypatch.setattr(backend, "upsert_vectors", lambda vectors: None)
+
+    async def main():
+        nonlocal second_released
+        second_released = asyncio.Event()
+        tasks = []
+        schedule = lambda func, *args: tasks.append(asyncio.ensure_future(func(*args)))
+        backend.start_ingest(schedule, *first)
+        backend.start_ingest(schedule, *second)
+        await tasks[0]
+        status_after_first = backend.get_ingest_status("user-2")["status"]
+        second_released.set()
+        await tasks[1]
+        return status_after_first
+
+    assert asyncio.run(main()) == "processing"
+    assert backend.get_ingest_status("user-2")["status"] == "ready"
+
+
+def test_embedding_batches_respect_input_and_token_limits(monkeypatch):
+    monkeypatch.setattr(backend, "EMBEDDING_BATCH_SIZE", 4)
+    monkeypatch.setattr(backend, "EMBEDDING_MAX_TOKENS", 1000)
+    monkeypatch.setattr(backend, "EMBEDDING_CHARS_PER_TOKEN", 2)
+    chunks = ["x" * 900] * 5 + ["y" * 10] * 6 + ["z" * 2000]
+
+    batches = list(backend._embedding_batches(chunks))
+
+    assert [c for batch in batches for c in batch] == chunks
+    assert all(len(batch) <= 4 for batch in batches)
+    assert all(sum(map(len, batch)) <= 2000 for batch in batches)
+    assert [len(batch) for batch in batches] == [2, 2, 4, 3, 1]